@@ -1,42 +1,248 @@
 import os
+import asyncio
 import json
 import re
-from typing import Optional, Any
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, Dict, List, Tuple
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib encoder if orjson isn't installed
+    orjson = None
 
 CACHE_DIR = "data/cache"
 if not os.path.exists(CACHE_DIR):
     os.makedirs(CACHE_DIR)
 
+# Hot keys are served from memory; the disk tier is bounded so data/cache
+# doesn't grow forever.
+MEM_CACHE_MAX_ENTRIES = 256
+DISK_CACHE_MAX_ENTRIES = 2000
+
+# Per-namespace max ages in seconds for get_from_cache(max_age=...); None never expires.
+DAY_SECONDS = 24 * 60 * 60
+LYRICS_MAX_AGE = None
+TRANSLATION_MAX_AGE = 30 * DAY_SECONDS
+PHONETICS_MAX_AGE = 30 * DAY_SECONDS
+LANGUAGE_MAX_AGE = 7 * DAY_SECONDS
+
+_MISS = object()
+
+_NON_WORD = re.compile(r'[^\w\s-]')
+_DASH_RUN = re.compile(r'[-\s]+')
+
+@functools.lru_cache(maxsize=1024)
 def _sanitize_filename(name: str) -> str:
     """Sanitizes a string to be a valid filename."""
-    name = name.lower()
-    name = re.sub(r'[^\w\s-]', '', name)
-    name = re.sub(r'[-\s]+', '-', name).strip('-_')
-    return name
-
-def _get_cache_filepath(key: str) -> str:
-    """Generates a filepath for a given cache key."""
-    sanitized_key = _sanitize_filename(key)
-    return os.path.join(CACHE_DIR, f"{sanitized_key}.json")
-
-def get_from_cache(key: str) -> Optional[Any]:
-    """Retrieves data from a cache file."""
-    filepath = _get_cache_filepath(key)
-    if not os.path.exists(filepath):
-        return None
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (IOError, json.JSONDecodeError) as e:
-        print(f"Cache read error for key '{key}': {e}")
-        return None
+    return _DASH_RUN.sub('-', _NON_WORD.sub('', name.lower())).strip('-_')
+
+def _loads(raw: bytes) -> Any:
+    """Decodes a cache file's contents."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
+def _dumps(data: Any) -> bytes:
+    """Encodes data for a cache file as compact JSON."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class CacheManager:
+    """Two-level cache: an LRU dict in memory in front of LRU-evicted JSON files on disk."""
+
+    def __init__(self, cache_dir: str, mem_max_entries: int = MEM_CACHE_MAX_ENTRIES, disk_max_entries: int = DISK_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.mem_max_entries = mem_max_entries
+        self.disk_max_entries = disk_max_entries
+        # Key -> (saved_at, data)
+        self.mem: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Cache filename -> last use time, least recently used first
+        self.disk_index: "OrderedDict[str, float]" = self._scan_disk()
+        # Guards the in-memory state in case the cache is used from worker threads.
+        self._lock = threading.Lock()
+        # Single background writer keeps cache file writes off the event loop
+        # while preserving write order for a given key.
+        self._io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-io")
+        # Key -> (filename, data, evicted) for writes queued but not started yet
+        self._pending_writes: Dict[str, Tuple[str, Any, List[str]]] = {}
+
+    def _scan_disk(self) -> "OrderedDict[str, float]":
+        """Builds the disk index from the cache directory, oldest files first."""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".json"):
+                        entries.append((entry.name, entry.stat().st_mtime))
+        except OSError as e:
+            print(f"Error scanning cache directory '{self.cache_dir}': {e}")
+        entries.sort(key=lambda item: item[1])
+        return OrderedDict(entries)
+
+    def _filename(self, key: str) -> str:
+        return f"{_sanitize_filename(key)}.json"
+
+    def _bump_disk(self, filename: str):
+        """Marks an indexed cache file as recently used; call with the lock held."""
+        if filename in self.disk_index:
+            self.disk_index[filename] = time.time()
+            self.disk_index.move_to_end(filename)
+
+    def _recall(self, key: str) -> Any:
+        """Looks up a (saved_at, data) entry in memory, returning _MISS if absent."""
+        with self._lock:
+            entry = self.mem.get(key, _MISS)
+            if entry is not _MISS:
+                self.mem.move_to_end(key)
+                # Memory hits count as uses of the file too, so hot keys aren't evicted from disk
+                self._bump_disk(self._filename(key))
+            return entry
+
+    def _remember(self, key: str, entry: Tuple[float, Any]):
+        """Stores a (saved_at, data) entry in memory, evicting the least recently used entry."""
+        with self._lock:
+            self.mem[key] = entry
+            self.mem.move_to_end(key)
+            if len(self.mem) > self.mem_max_entries:
+                self.mem.popitem(last=False)
+
+    def _touch_disk(self, filename: str) -> List[str]:
+        """Marks a cache file as recently used and returns the filenames to evict."""
+        with self._lock:
+            self.disk_index[filename] = time.time()
+            self.disk_index.move_to_end(filename)
+            evicted = []
+            while len(self.disk_index) > self.disk_max_entries:
+                evicted.append(self.disk_index.popitem(last=False)[0])
+            return evicted
+
+    def _read_from_disk(self, key: str, filename: str) -> Optional[Tuple[float, Any]]:
+        """Reads a cache file, returning its mtime and data."""
+        try:
+            with open(os.path.join(self.cache_dir, filename), 'rb') as f:
+                return os.fstat(f.fileno()).st_mtime, _loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (IOError, ValueError) as e:
+            print(f"Cache read error for key '{key}': {e}")
+            return None
+
+    def _read_many_from_disk(self, filenames: Dict[str, str]) -> Dict[str, Optional[Tuple[float, Any]]]:
+        """Reads several cache files, keyed by cache key."""
+        return {key: self._read_from_disk(key, filename) for key, filename in filenames.items()}
+
+    def _write_to_disk(self, key: str, filename: str, data: Any, evicted: List[str]):
+        """Writes data to a cache file and removes evicted ones, going by the disk index at write time."""
+        filepath = os.path.join(self.cache_dir, filename)
+        with self._lock:
+            # A queued write whose file has since been evicted would outlive the bound
+            indexed = filename in self.disk_index
+        if indexed:
+            try:
+                with open(filepath, 'wb') as f:
+                    f.write(_dumps(data))
+                    print(f"Saved to cache: {filepath}")
+            except IOError as e:
+                print(f"Error saving to cache for key '{key}': {e}")
+        for name in evicted:
+            with self._lock:
+                # The file may have been saved again since it was evicted
+                if name in self.disk_index:
+                    continue
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Error evicting cache file '{name}': {e}")
+
+    def _loaded(self, key: str, filename: str, entry: Optional[Tuple[float, Any]]):
+        if entry is not None:
+            self._remember(key, entry)
+            with self._lock:
+                self._bump_disk(filename)
+
+    def _fresh_data(self, entry: Optional[Tuple[float, Any]], max_age: Optional[float]) -> Optional[Any]:
+        """Returns the entry's data, or None if it is missing or older than max_age."""
+        if entry is None:
+            return None
+        saved_at, data = entry
+        if max_age is not None and time.time() - saved_at > max_age:
+            return None
+        return data
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Any]:
+        entry = self._recall(key)
+        if entry is _MISS:
+            filename = self._filename(key)
+            entry = self._read_from_disk(key, filename)
+            self._loaded(key, filename, entry)
+        return self._fresh_data(entry, max_age)
+
+    async def aget(self, key: str, max_age: Optional[float] = None) -> Optional[Any]:
+        entry = self._recall(key)
+        if entry is _MISS:
+            filename = self._filename(key)
+            entry = await asyncio.to_thread(self._read_from_disk, key, filename)
+            self._loaded(key, filename, entry)
+        return self._fresh_data(entry, max_age)
+
+    async def amget(self, keys: List[str], max_age: Optional[float] = None) -> Dict[str, Any]:
+        entries = {key: self._recall(key) for key in keys}
+        filenames = {key: self._filename(key) for key, entry in entries.items() if entry is _MISS}
+        if filenames:
+            # Read every memory miss in a single worker-thread hop
+            loaded = await asyncio.to_thread(self._read_many_from_disk, filenames)
+            for key, entry in loaded.items():
+                self._loaded(key, filenames[key], entry)
+                entries[key] = entry
+        return {key: self._fresh_data(entry, max_age) for key, entry in entries.items()}
+
+    def save(self, key: str, data: Any):
+        self._remember(key, (time.time(), data))
+        filename = self._filename(key)
+        self._write_to_disk(key, filename, data, self._touch_disk(filename))
+
+    def _flush_pending(self, key: str):
+        """Writes the latest queued data for a key."""
+        with self._lock:
+            filename, data, evicted = self._pending_writes.pop(key)
+        self._write_to_disk(key, filename, data, evicted)
+
+    def save_async(self, key: str, data: Any):
+        self._remember(key, (time.time(), data))
+        filename = self._filename(key)
+        evicted = self._touch_disk(filename)
+        with self._lock:
+            queued = self._pending_writes.get(key)
+            # Saves to a key that is still queued replace its data rather than writing twice
+            self._pending_writes[key] = (filename, data, queued[2] + evicted if queued else evicted)
+        if queued is None:
+            self._io_pool.submit(self._flush_pending, key)
+
+_cache = CacheManager(CACHE_DIR)
+
+def get_from_cache(key: str, max_age: Optional[float] = None) -> Optional[Any]:
+    """Retrieves data from the memory cache, falling back to the cache file; entries older than max_age seconds are misses."""
+    return _cache.get(key, max_age)
+
+async def aget_from_cache(key: str, max_age: Optional[float] = None) -> Optional[Any]:
+    """Like get_from_cache, but reads the cache file in a worker thread on a memory miss."""
+    return await _cache.aget(key, max_age)
+
+async def amget_from_cache(keys: List[str], max_age: Optional[float] = None) -> Dict[str, Any]:
+    """Retrieves several keys at once, mapping each key to its data or None on a miss."""
+    return await _cache.amget(keys, max_age)
 
 def save_to_cache(key: str, data: Any):
-    """Saves data to a cache file."""
-    filepath = _get_cache_filepath(key)
-    try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-            print(f"Saved to cache: {filepath}")
-    except IOError as e:
-        print(f"Error saving to cache for key '{key}': {e}") 
\ No newline at end of file
+    """Saves data to the memory cache and a cache file."""
+    _cache.save(key, data)
+
+def save_to_cache_async(key: str, data: Any):
+    """Saves data to the memory cache and schedules the cache file write in the background."""
+    _cache.save_async(key, data)
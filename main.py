@@ -3,23 +3,41 @@ from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 import os
+import logging
 from dotenv import load_dotenv
 from spotify_service import SpotifyService
 from translation_service import TranslationService
 import socket
 import asyncio
 import csv
-import json
-from typing import List
+import pickle
+import functools
+from typing import List, Optional
+
+try:
+    import orjson
+except ImportError:  # Fall back to Starlette's stdlib JSON encoding if orjson isn't installed
+    orjson = None
 
 # Load environment variables
 load_dotenv()
 
+# LOG_LEVEL only applies to this app's logger; libraries such as httpx stay at WARNING
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
 app = FastAPI()
 
 def is_port_in_use(port: int) -> bool:
+    # Binding fails immediately if the port is taken, unlike a TCP connect probe
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex(('localhost', port)) == 0
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind(('127.0.0.1', port))
+            return False
+        except OSError:
+            return True
 
 # Only mount static files if directory exists
 if os.path.exists("static"):
@@ -28,6 +46,17 @@ if os.path.exists("data"):
     app.mount("/data", StaticFiles(directory="data"), name="data")
 
 templates = Jinja2Templates(directory="templates")
+# Templates don't change while the server runs, so skip Jinja2's per-lookup
+# staleness check and keep direct references to the compiled templates.
+templates.env.auto_reload = False
+_TPL_INDEX = templates.get_template("index.html")
+_TPL_NO_SONG = templates.get_template("components/no_song.html")
+_TPL_SONG_HEADER = templates.get_template("components/song_header.html")
+_TPL_LYRICS = templates.get_template("components/lyrics.html")
+_TPL_LYRICS_LOADER = templates.get_template("components/lyrics_loader.html")
+_TPL_ERROR = templates.get_template("components/error.html")
+_TPL_STATS = templates.get_template("components/stats_card.html")
+_TPL_LANG_LIST = templates.get_template("components/language_list.html")
 
 # In-memory store for user preferences for a single-user session.
 # This replaces the JSON file-based storage.
@@ -45,31 +74,52 @@ def save_user_preferences(preferences: dict):
     global user_preferences
     user_preferences.update(preferences)
 
+# Bump when the shape of the parsed languages dict changes so old pickles get rebuilt
+LANGUAGES_CACHE_VERSION = 1
+
 def load_languages_from_csv(file_path: str) -> dict:
-    languages = {}
+    """Loads supported languages from the CSV, reusing a pickled copy while the CSV and cache format are unchanged."""
+    cache_path = os.path.splitext(file_path)[0] + ".cache.pkl"
+    try:
+        csv_mtime = os.stat(file_path).st_mtime
+        with open(cache_path, 'rb') as f:
+            cached_version, cached_mtime, languages = pickle.load(f)
+        if cached_version == LANGUAGES_CACHE_VERSION and cached_mtime == csv_mtime:
+            return languages
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass # Missing, unreadable or stale pickle, rebuild from the CSV below
+
     try:
         with open(file_path, mode='r', encoding='utf-8') as csv_file:
             # Clean up header whitespace
             reader = csv.reader(csv_file)
             header = [h.strip() for h in next(reader)]
-            csv_reader = csv.DictReader(csv_file, fieldnames=header)
+            i_code = header.index('639-1')
+            i_name = header.index('Language name')
+            i_flag = header.index('Flag')
+            min_len = max(i_code, i_name) + 1
             
-            for row in csv_reader:
-                code = row.get('639-1')
-                name = row.get('Language name')
-                flag = row.get('Flag')
-                if code and name:
-                    languages[code] = {
-                        "name": name.split(';')[0].split(',')[0].strip(),
-                        "flag": flag.strip() if flag else ""
-                    }
+            languages = {
+                row[i_code]: {
+                    "name": row[i_name].split(';')[0].split(',')[0].strip(),
+                    "flag": row[i_flag].strip() if i_flag < len(row) else ""
+                }
+                for row in reader
+                if len(row) >= min_len and row[i_code] and row[i_name]
+            }
     except Exception as e:
-        print(f"Error loading languages from CSV: {e}")
+        logger.error("Error loading languages from CSV: %s", e)
         # Fallback to a minimal list if CSV parsing fails
         return {
             "en": {"name": "English", "flag": "🇬🇧"}, 
             "es": {"name": "Spanish", "flag": "🇪🇸"}
         }
+
+    try:
+        with open(cache_path, 'wb') as f:
+            pickle.dump((LANGUAGES_CACHE_VERSION, csv_mtime, languages), f)
+    except Exception as e:
+        logger.error("Error saving languages cache: %s", e)
     return languages
 
 # Use environment variables properly
@@ -83,6 +133,13 @@ translation_service = TranslationService()
 
 SUPPORTED_LANGUAGES = load_languages_from_csv("data/Languages.csv")
 
+@functools.lru_cache(maxsize=32)
+def _sorted_languages(selected: frozenset) -> dict:
+    """Returns SUPPORTED_LANGUAGES ordered with the selected languages first."""
+    all_langs = list(SUPPORTED_LANGUAGES.items())
+    all_langs.sort(key=lambda item: item[0] in selected, reverse=True)
+    return dict(all_langs)
+
 # Define our simplified model options
 TRANSLATION_PROFILES = {
     "gemini-2.5-flash-preview-05-20_default": {
@@ -125,56 +182,44 @@ TRANSLATION_PROFILES = {
 @app.get("/", response_class=HTMLResponse)
 def root(request: Request):
     user_prefs = get_user_preferences()
-    user_languages = user_prefs.get('languages', [])
+    # A frozenset gives O(1) membership tests for the sort and the template,
+    # and is hashable for the memoized ordering.
+    user_languages = frozenset(user_prefs.get('languages', []))
     
     # Sort languages to show selected ones first
-    all_langs = list(SUPPORTED_LANGUAGES.items())
-    all_langs.sort(key=lambda item: item[0] in user_languages, reverse=True)
-    sorted_languages = dict(all_langs)
+    sorted_languages = _sorted_languages(user_languages)
     
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request, 
-            "languages": sorted_languages,
-            "user_languages": user_languages,
-            "translation_profiles": TRANSLATION_PROFILES,
-            "user_profile": user_prefs.get('translation_profile', 'gemini-2.5-flash-preview-05-20_default'),
-            "initial_message": "Translate a song to see stats here."
-        }
-    )
+    return HTMLResponse(_TPL_INDEX.render({
+        "request": request, 
+        "languages": sorted_languages,
+        "user_languages": user_languages,
+        "translation_profiles": TRANSLATION_PROFILES,
+        "user_profile": user_prefs.get('translation_profile', 'gemini-2.5-flash-preview-05-20_default'),
+        "initial_message": "Translate a song to see stats here."
+    }))
 
 @app.get("/current-song", response_class=HTMLResponse)
 def get_current_song(request: Request):
     try:
-        print("Starting current song request")
+        logger.debug("Starting current song request")
         song = spotify_service.get_current_song_info()
         
-        print(f"Song data received: {song.title if song else 'None'}")
+        logger.debug("Song data received: %s", song.title if song else None)
         
         if not song:
-            return templates.TemplateResponse(
-                "components/no_song.html",
-                {"request": request}
-            )
+            return HTMLResponse(_TPL_NO_SONG.render({"request": request}))
             
-        return templates.TemplateResponse(
-            "components/song_header.html",
-            {"request": request, "song": song}
-        )
+        return HTMLResponse(_TPL_SONG_HEADER.render({"request": request, "song": song}))
     except Exception as e:
-        print(f"Error in get_current_song: {str(e)}")
-        return templates.TemplateResponse(
-            "components/error.html",
-            {
-                "request": request,
-                "message": f"An error occurred: {str(e)}"
-            }
-        )
+        logger.error("Error in get_current_song: %s", e)
+        return HTMLResponse(_TPL_ERROR.render({
+            "request": request,
+            "message": f"An error occurred: {str(e)}"
+        }))
 
 @app.get("/lyrics-loader", response_class=HTMLResponse)
 def lyrics_loader(request: Request):
-    return templates.TemplateResponse("components/lyrics_loader.html", {"request": request})
+    return HTMLResponse(_TPL_LYRICS_LOADER.render({"request": request}))
 
 @app.get("/get-lyrics", response_class=HTMLResponse)
 async def get_lyrics(request: Request):
@@ -182,29 +227,23 @@ async def get_lyrics(request: Request):
         # Get current song from cache or fetch fresh
         song = spotify_service.current_song_cache
         if not song:
-            song = spotify_service.get_current_song_info()
+            song = await spotify_service.aget_current_song_info()
         
         if not song:
-            return templates.TemplateResponse(
-                "components/no_song.html",
-                {"request": request}
-            )
+            return HTMLResponse(_TPL_NO_SONG.render({"request": request}))
         
         # Fetch lyrics for the song
-        song_with_lyrics = spotify_service.get_lyrics_for_song(song)
+        song_with_lyrics = await spotify_service.get_lyrics_for_song(song)
         
         if not song_with_lyrics or not song_with_lyrics.lyrics:
-            return templates.TemplateResponse(
-                "components/error.html",
-                {
-                    "request": request,
-                    "message": "No lyrics found for this song. Some songs may not have synchronized lyrics available."
-                }
-            )
+            return HTMLResponse(_TPL_ERROR.render({
+                "request": request,
+                "message": "No lyrics found for this song. Some songs may not have synchronized lyrics available."
+            }))
         
         # Detect language now that we have lyrics
         if not song_with_lyrics.original_languages:
-            print(f"Lyrics found for {song_with_lyrics.title}, detecting language...")
+            logger.debug("Lyrics found for %s, detecting language...", song_with_lyrics.title)
             user_prefs = get_user_preferences()
             profile_key = user_prefs.get('translation_profile', 'gemini-2.5-flash-preview-05-20_default')
             profile = TRANSLATION_PROFILES[profile_key]
@@ -214,34 +253,30 @@ async def get_lyrics(request: Request):
                 song_with_lyrics.title,
                 song_with_lyrics.artist,
                 model_name=profile["model"],
-                thinking_mode=profile["thinking_mode"]
+                thinking_mode=profile["thinking_mode"],
+                lyrics_version=song_with_lyrics.lyrics_version,
+                spotify_id=song_with_lyrics.spotify_id
             )
             song_with_lyrics.original_languages = langs
-            print(f"Languages detected: {langs}")
+            logger.debug("Languages detected: %s", langs)
         
-        return templates.TemplateResponse(
-            "components/lyrics.html",
-            {"request": request, "song": song_with_lyrics, "selected_languages": []}
-        )
+        return HTMLResponse(_TPL_LYRICS.render({"request": request, "song": song_with_lyrics, "selected_languages": []}))
         
     except Exception as e:
-        print(f"Error getting lyrics: {str(e)}")
-        return templates.TemplateResponse(
-            "components/error.html",
-            {
-                "request": request,
-                "message": f"Error fetching lyrics: {str(e)}"
-            }
-        )
+        logger.error("Error getting lyrics: %s", e)
+        return HTMLResponse(_TPL_ERROR.render({
+            "request": request,
+            "message": f"Error fetching lyrics: {str(e)}"
+        }))
 
 @app.get("/get-song-and-lyrics", response_class=HTMLResponse)
 async def get_song_and_lyrics(request: Request):
     try:
         # 1. Get song info
-        song = spotify_service.get_current_song_info()
+        song = await spotify_service.aget_current_song_info()
         
         if not song:
-            no_song_html = templates.TemplateResponse("components/no_song.html", {"request": request}).body.decode()
+            no_song_html = _TPL_NO_SONG.render({"request": request})
             lyrics_placeholder = '<p class="text-gray-500 text-center">No song is currently playing on Spotify.</p>'
             
             return HTMLResponse(content=f"""
@@ -250,19 +285,14 @@ async def get_song_and_lyrics(request: Request):
             """)
 
         # 2. Get lyrics
-        song_with_lyrics = spotify_service.get_lyrics_for_song(song)
+        song_with_lyrics = await spotify_service.get_lyrics_for_song(song)
         
-        song_header_template = templates.get_template("components/song_header.html")
-
         if not song_with_lyrics or not song_with_lyrics.lyrics:
-            song_header_html = song_header_template.render({"request": request, "song": song})
-            lyrics_error_html = templates.TemplateResponse(
-                "components/error.html",
-                {
-                    "request": request,
-                    "message": "No lyrics found for this song. Some songs may not have synchronized lyrics available."
-                }
-            ).body.decode()
+            song_header_html = _TPL_SONG_HEADER.render({"request": request, "song": song})
+            lyrics_error_html = _TPL_ERROR.render({
+                "request": request,
+                "message": "No lyrics found for this song. Some songs may not have synchronized lyrics available."
+            })
             return HTMLResponse(content=f"""
                 <div id="song-container" hx-swap-oob="true">{song_header_html}</div>
                 {lyrics_error_html}
@@ -270,7 +300,7 @@ async def get_song_and_lyrics(request: Request):
 
         # 3. Detect language
         if not song_with_lyrics.original_languages:
-            print(f"Lyrics found for {song_with_lyrics.title}, detecting language...")
+            logger.debug("Lyrics found for %s, detecting language...", song_with_lyrics.title)
             user_prefs = get_user_preferences()
             profile_key = user_prefs.get('translation_profile', 'gemini-2.5-flash-preview-05-20_default')
             profile = TRANSLATION_PROFILES[profile_key]
@@ -280,15 +310,16 @@ async def get_song_and_lyrics(request: Request):
                 song_with_lyrics.title,
                 song_with_lyrics.artist,
                 model_name=profile["model"],
-                thinking_mode=profile["thinking_mode"]
+                thinking_mode=profile["thinking_mode"],
+                lyrics_version=song_with_lyrics.lyrics_version,
+                spotify_id=song_with_lyrics.spotify_id
             )
             song_with_lyrics.original_languages = langs
-            print(f"Languages detected: {langs}")
+            logger.debug("Languages detected: %s", langs)
         
         # 4. Render templates
-        song_header_html = song_header_template.render({"request": request, "song": song_with_lyrics})
-        lyrics_template = templates.get_template("components/lyrics.html")
-        lyrics_html = lyrics_template.render({"request": request, "song": song_with_lyrics, "selected_languages": []})
+        song_header_html = _TPL_SONG_HEADER.render({"request": request, "song": song_with_lyrics})
+        lyrics_html = _TPL_LYRICS.render({"request": request, "song": song_with_lyrics, "selected_languages": []})
         
         return HTMLResponse(content=f"""
             <div id="song-container" hx-swap-oob="true">{song_header_html}</div>
@@ -296,14 +327,8 @@ async def get_song_and_lyrics(request: Request):
         """)
         
     except Exception as e:
-        print(f"Error in get_song_and_lyrics: {str(e)}")
-        error_message_html = templates.TemplateResponse(
-            "components/error.html",
-            {
-                "request": request,
-                "message": f"An error occurred: {str(e)}"
-            }
-        ).body.decode()
+        logger.error("Error in get_song_and_lyrics: %s", e)
+        error_message_html = _TPL_ERROR.render({"request": request, "message": f"An error occurred: {str(e)}"})
         return HTMLResponse(content=f"""
             <div id="song-container" hx-swap-oob="true">{error_message_html}</div>
             {error_message_html}
@@ -313,10 +338,10 @@ async def get_song_and_lyrics(request: Request):
 async def get_song_lyrics_phonetics(request: Request):
     try:
         # 1. Get song info
-        song = spotify_service.get_current_song_info()
+        song = await spotify_service.aget_current_song_info()
         
         if not song:
-            no_song_html = templates.TemplateResponse("components/no_song.html", {"request": request}).body.decode()
+            no_song_html = _TPL_NO_SONG.render({"request": request})
             lyrics_placeholder = '<p class="text-gray-500 text-center">No song is currently playing on Spotify.</p>'
             
             return HTMLResponse(content=f"""
@@ -325,19 +350,14 @@ async def get_song_lyrics_phonetics(request: Request):
             """)
 
         # 2. Get lyrics
-        song_with_lyrics = spotify_service.get_lyrics_for_song(song)
+        song_with_lyrics = await spotify_service.get_lyrics_for_song(song)
         
-        song_header_template = templates.get_template("components/song_header.html")
-
         if not song_with_lyrics or not song_with_lyrics.lyrics:
-            song_header_html = song_header_template.render({"request": request, "song": song})
-            lyrics_error_html = templates.TemplateResponse(
-                "components/error.html",
-                {
-                    "request": request,
-                    "message": "No lyrics found for this song. Some songs may not have synchronized lyrics available."
-                }
-            ).body.decode()
+            song_header_html = _TPL_SONG_HEADER.render({"request": request, "song": song})
+            lyrics_error_html = _TPL_ERROR.render({
+                "request": request,
+                "message": "No lyrics found for this song. Some songs may not have synchronized lyrics available."
+            })
             return HTMLResponse(content=f"""
                 <div id="song-container" hx-swap-oob="true">{song_header_html}</div>
                 {lyrics_error_html}
@@ -351,33 +371,36 @@ async def get_song_lyrics_phonetics(request: Request):
         thinking_mode = profile["thinking_mode"]
 
         if not song_with_lyrics.original_languages:
-            print(f"Lyrics found for {song_with_lyrics.title}, detecting language...")
+            logger.debug("Lyrics found for %s, detecting language...", song_with_lyrics.title)
             langs = await translation_service.detect_language(
                 song_with_lyrics.lyrics,
                 song_with_lyrics.title,
                 song_with_lyrics.artist,
                 model_name=model,
-                thinking_mode=thinking_mode
+                thinking_mode=thinking_mode,
+                lyrics_version=song_with_lyrics.lyrics_version,
+                spotify_id=song_with_lyrics.spotify_id
             )
             song_with_lyrics.original_languages = langs
-            print(f"Languages detected: {langs}")
+            logger.debug("Languages detected: %s", langs)
         
         # 4. Get Phonetics
-        print(f"Fetching phonetics for {song_with_lyrics.title}...")
+        logger.debug("Fetching phonetics for %s...", song_with_lyrics.title)
         song_with_lyrics.lyrics = await translation_service.get_phonetics(
             song_with_lyrics.title,
             song_with_lyrics.artist,
             song_with_lyrics.lyrics,
             song_with_lyrics.original_languages,
             model_name=model,
-            thinking_mode=thinking_mode
+            thinking_mode=thinking_mode,
+            lyrics_version=song_with_lyrics.lyrics_version,
+            spotify_id=song_with_lyrics.spotify_id
         )
-        print("Phonetics fetched.")
+        logger.debug("Phonetics fetched.")
 
         # 5. Render templates
-        song_header_html = song_header_template.render({"request": request, "song": song_with_lyrics})
-        lyrics_template = templates.get_template("components/lyrics.html")
-        lyrics_html = lyrics_template.render({"request": request, "song": song_with_lyrics, "selected_languages": {}})
+        song_header_html = _TPL_SONG_HEADER.render({"request": request, "song": song_with_lyrics})
+        lyrics_html = _TPL_LYRICS.render({"request": request, "song": song_with_lyrics, "selected_languages": {}})
         
         return HTMLResponse(content=f"""
             <div id="song-container" hx-swap-oob="true">{song_header_html}</div>
@@ -385,11 +408,8 @@ async def get_song_lyrics_phonetics(request: Request):
         """)
         
     except Exception as e:
-        print(f"Error in get_song_lyrics_phonetics: {str(e)}")
-        error_message_html = templates.TemplateResponse(
-            "components/error.html",
-            {"request": request, "message": f"An error occurred: {str(e)}"}
-        ).body.decode()
+        logger.error("Error in get_song_lyrics_phonetics: %s", e)
+        error_message_html = _TPL_ERROR.render({"request": request, "message": f"An error occurred: {str(e)}"})
         return HTMLResponse(content=f"""
             <div id="song-container" hx-swap-oob="true">{error_message_html}</div>
             {error_message_html}
@@ -406,31 +426,24 @@ async def translate_song(request: Request):
             user_prefs = get_user_preferences()
             saved_languages = user_prefs.get('languages', [])
             if saved_languages:
-                print(f"No languages selected, using saved preferences: {saved_languages}")
+                logger.debug("No languages selected, using saved preferences: %s", saved_languages)
                 language_codes = saved_languages
             else:
-                return templates.TemplateResponse(
-                    "components/error.html",
-                    {"request": request, "message": "Please select at least one language or save your preferences."}
-                )
+                return HTMLResponse(_TPL_ERROR.render({"request": request, "message": "Please select at least one language or save your preferences."}))
         
         # Use cached song with lyrics
         song = spotify_service.current_song_cache
         if not song:
-            return templates.TemplateResponse(
-                "components/error.html",
-                {"request": request, "message": "No song loaded. Please get a song and lyrics first."}
-            )
+            return HTMLResponse(_TPL_ERROR.render({"request": request, "message": "No song loaded. Please get a song and lyrics first."}))
         
         if not song.lyrics:
-            return templates.TemplateResponse(
-                "components/error.html",
-                {"request": request, "message": "No lyrics found. Please get lyrics first."}
-            )
+            return HTMLResponse(_TPL_ERROR.render({"request": request, "message": "No lyrics found. Please get lyrics first."}))
         
+        selected_languages_details = {
+            code: SUPPORTED_LANGUAGES[code] for code in language_codes if code in SUPPORTED_LANGUAGES
+        }
         languages_to_translate = {
-            code: SUPPORTED_LANGUAGES[code]["name"] 
-            for code in language_codes if code in SUPPORTED_LANGUAGES
+            code: details["name"] for code, details in selected_languages_details.items()
         }
         
         user_prefs = get_user_preferences()
@@ -447,7 +460,9 @@ async def translate_song(request: Request):
             languages_to_translate,
             song.original_languages,
             model_name=model,
-            thinking_mode=thinking_mode
+            thinking_mode=thinking_mode,
+            lyrics_version=song.lyrics_version,
+            spotify_id=song.spotify_id
         )
         
         title_task = translation_service.translate_text(
@@ -462,26 +477,19 @@ async def translate_song(request: Request):
         song.lyrics, translation_stats = results[0]
         song.translated_titles = results[1]
         
-        selected_languages_details = {
-            code: SUPPORTED_LANGUAGES[code] for code in language_codes if code in SUPPORTED_LANGUAGES
-        }
-        
         # Render all components
-        lyrics_template = templates.get_template("components/lyrics.html")
-        lyrics_html = lyrics_template.render({
+        lyrics_html = _TPL_LYRICS.render({
             "request": request, 
             "song": song, 
             "selected_languages": selected_languages_details
         })
 
-        song_header_template = templates.get_template("components/song_header.html")
-        song_header_html = song_header_template.render({
+        song_header_html = _TPL_SONG_HEADER.render({
             "request": request,
             "song": song
         })
 
-        stats_template = templates.get_template("components/stats_card.html")
-        stats_html = stats_template.render({
+        stats_html = _TPL_STATS.render({
             "request": request,
             "stats": translation_stats
         })
@@ -493,11 +501,8 @@ async def translate_song(request: Request):
         """)
         
     except Exception as e:
-        print(f"Translation error: {str(e)}")
-        return templates.TemplateResponse(
-            "components/error.html",
-            {"request": request, "message": f"Error: {str(e)}"}
-        )
+        logger.error("Translation error: %s", e)
+        return HTMLResponse(_TPL_ERROR.render({"request": request, "message": f"Error: {str(e)}"}))
 
 @app.post("/preferences")
 async def save_language_preferences(request: Request):
@@ -509,19 +514,15 @@ async def save_language_preferences(request: Request):
     save_user_preferences(prefs)
     
     # Sort languages to show selected ones first for the re-rendered component
-    all_langs = list(SUPPORTED_LANGUAGES.items())
-    all_langs.sort(key=lambda item: item[0] in selected_languages, reverse=True)
-    sorted_languages = dict(all_langs)
+    user_languages = frozenset(selected_languages)
+    sorted_languages = _sorted_languages(user_languages)
     
     # Return an updated fragment of the languages UI
-    return templates.TemplateResponse(
-        "components/language_list.html",
-        {
-            "request": request,
-            "languages": sorted_languages,
-            "user_languages": prefs['languages']
-        }
-    )
+    return HTMLResponse(_TPL_LANG_LIST.render({
+        "request": request,
+        "languages": sorted_languages,
+        "user_languages": user_languages
+    }))
 
 @app.post("/preferences/profile")
 async def save_profile_preference(request: Request):
@@ -537,33 +538,59 @@ async def save_profile_preference(request: Request):
     
     return HTMLResponse(status_code=204)
 
+# The client extrapolates the playback position locally, so the server only
+# needs to push a state when play/pause toggles or the position drifts (seek,
+# track change) from where the client would expect it to be.
+WS_POLL_RETRY_SECONDS = 3  # After failing to get the playback state
+WS_RESYNC_THRESHOLD_SECONDS = 1.5
+
+def _playback_changed(previous: Optional[dict], current: dict) -> bool:
+    """Checks whether a playback state differs from what the client already extrapolates."""
+    if previous is None or previous["is_playing"] != current["is_playing"]:
+        return True
+    expected_position = previous["position"]
+    if previous["is_playing"]:
+        expected_position += current["timestamp"] - previous["timestamp"]
+    return abs(current["position"] - expected_position) > WS_RESYNC_THRESHOLD_SECONDS
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    print("WebSocket connection accepted.")
+    logger.debug("WebSocket connection accepted.")
+    last_sent_state = None
+    loop = asyncio.get_running_loop()
+    next_poll_at = loop.time()
     try:
         while True:
-            # Handle client-side ping to keep connection alive
-            try:
-                data = await asyncio.wait_for(websocket.receive_text(), timeout=1.0)
-                if data == 'ping':
-                    continue
-            except asyncio.TimeoutError:
-                pass # No data from client is fine, proceed to send server state
-
-            playback_state = spotify_service.get_current_playback_state()
-            if playback_state:
-                await websocket.send_json(playback_state)
+            # Handle client-side pings while waiting for the next poll to be due
+            timeout = next_poll_at - loop.time()
+            if timeout > 0:
+                try:
+                    data = await asyncio.wait_for(websocket.receive_text(), timeout=timeout)
+                    if data == 'ping':
+                        continue
+                except asyncio.TimeoutError:
+                    pass # No data from client is fine, proceed to send server state
+
+            playback_state = await spotify_service.aget_current_playback_state()
+            if playback_state and _playback_changed(last_sent_state, playback_state):
+                # Sent as text since the client JSON.parses event.data
+                if orjson is not None:
+                    await websocket.send_text(orjson.dumps(playback_state).decode())
+                else:
+                    await websocket.send_json(playback_state)
+                last_sent_state = playback_state
             
-            # Send updates roughly every second
-            await asyncio.sleep(1)
+            # Poll again once the service's cached state expires; polling sooner only
+            # returns the extrapolated position the client already computes.
+            next_poll_at = loop.time() + (playback_state["next_poll_in"] if playback_state else WS_POLL_RETRY_SECONDS)
             
     except WebSocketDisconnect:
-        print("Client disconnected from WebSocket.")
+        logger.debug("Client disconnected from WebSocket.")
     except Exception as e:
-        print(f"Error in WebSocket: {e}")
+        logger.error("Error in WebSocket: %s", e)
     finally:
-        print("Closing WebSocket connection.")
+        logger.debug("Closing WebSocket connection.")
 
 if __name__ == "__main__":
     import uvicorn
@@ -571,11 +598,11 @@ if __name__ == "__main__":
     # Find an available port starting from 8000
     port = 8000
     while is_port_in_use(port) and port < 8010:
-        print(f"Port {port} is in use, trying next port...")
+        logger.info("Port %s is in use, trying next port...", port)
         port += 1
     
     if port >= 8010:
         raise RuntimeError("No available ports found between 8000 and 8009")
     
-    print(f"Starting server on http://127.0.0.1:{port}")
+    logger.info("Starting server on http://127.0.0.1:%s", port)
     uvicorn.run(app, host="127.0.0.1", port=port) 
\ No newline at end of file
@@ -22,5 +22,6 @@ class Song(BaseModel):
     current_position: float = 0  # Current playback position in seconds
     is_playing: bool = False
     lyrics: List[LyricLine] = []
+    lyrics_version: Optional[str] = None  # Fingerprint of the lyrics, used to invalidate derived caches
     original_languages: List[str] = []
     translated_titles: Dict[str, str] = {} 
\ No newline at end of file
@@ -3,11 +3,65 @@ from spotipy.oauth2 import SpotifyOAuth
 import syncedlyrics
 from models import Song, LyricLine
 import re
-from typing import Optional, List
-from concurrent.futures import ThreadPoolExecutor
+from pydantic import TypeAdapter
+import hashlib
+import asyncio
+from typing import Optional, List, Tuple
 import time
 import cache_service
 
+_LINE_TS_RE = re.compile(r'^\[(\d+:\d+\.\d+)\]')
+_WORD_TS_RE = re.compile(r'<(\d+:\d+\.\d+)>([^<]*)')
+_BRACKET_RE = re.compile(r'\[([^\]]+)\]')
+_BRACKET_STRIP_RE = re.compile(r'\[[^\]]+\]')
+
+# Validates a cached lyrics list in one call instead of one model_validate per line
+_LYRIC_LINES = TypeAdapter(List[LyricLine])
+
+# Bounds in seconds for how long a fetched playback state is reused. The cap
+# keeps pauses and seeks made in Spotify showing up within a few seconds.
+PLAYBACK_CACHE_MIN_TTL = 0.5
+PLAYBACK_CACHE_MAX_TTL = 5
+
+def _ts_to_seconds(timestamp: str) -> float:
+    """Converts an mm:ss.xx timestamp to seconds."""
+    minutes, _, seconds = timestamp.partition(':')
+    return int(minutes) * 60 + float(seconds)
+
+def _make_line(timestamp: str, text: str) -> LyricLine:
+    """Builds a LyricLine from a bare mm:ss.xx timestamp and its text."""
+    return LyricLine(
+        timestamp=f"[{timestamp}]",
+        time_seconds=_ts_to_seconds(timestamp),
+        original=text
+    )
+
+def _parse_enhanced_line(line: str) -> Tuple[Optional[str], str]:
+    """Splits an enhanced LRC line into its timestamp and text."""
+    words = _WORD_TS_RE.findall(line)
+    if words:
+        text = ' '.join(word.strip() for _, word in words if word.strip())
+    else:
+        # Line has no word-level timing, keep its plain text
+        text = _BRACKET_STRIP_RE.sub('', line).strip()
+    
+    # Prefer the line timestamp, fall back to the first word's
+    line_ts = _LINE_TS_RE.match(line)
+    if line_ts:
+        return line_ts.group(1), text
+    return (words[0][0] if words else None), text
+
+def _parse_regular_line(line: str) -> Tuple[Optional[str], str]:
+    """Splits a regular LRC line into its timestamp and text."""
+    timestamp = _BRACKET_RE.search(line)
+    text = _BRACKET_STRIP_RE.sub('', line).strip()
+    return (timestamp.group(1) if timestamp else None), text
+
+def _lyrics_version(lyrics: List[LyricLine]) -> str:
+    """Fingerprints lyrics text so caches derived from it can detect re-fetched lyrics."""
+    text = "\n".join(line.original for line in lyrics)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
 class SpotifyService:
     def __init__(self, client_id: str, client_secret: str, redirect_uri: str):
         self.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
@@ -19,60 +73,24 @@ class SpotifyService:
         self.current_song_cache = None
         self.lyrics_fetch_time = 0
         self.lyrics_timeout = 30  # Timeout after 30 seconds
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        self._playback_cache = None  # (fetched_at, ttl, state)
+        self._inflight = {}  # spotify_id -> in-progress lyrics fetch
 
     def parse_enhanced_lrc(self, lrc: str) -> List[LyricLine]:
-        lyrics = []
-        current_line = []
-        current_timestamp = None
-        
-        for line in lrc.split('\n'):
-            if not line.strip():
-                continue
-            
-            # Find all timestamp-word pairs in the line
-            matches = re.finditer(r'<(\d+:\d+\.\d+)>([^<]+)', line)
-            for match in matches:
-                timestamp, word = match.groups()
-                if not current_timestamp:
-                    current_timestamp = timestamp
-                current_line.append(word.strip())
-            
-            # End of line - create LyricLine
-            if current_line:
-                # Convert timestamp to seconds
-                minutes, seconds = map(float, current_timestamp.split(':'))
-                total_seconds = minutes * 60 + seconds
-                
-                lyrics.append(LyricLine(
-                    timestamp=f"[{current_timestamp}]",
-                    time_seconds=total_seconds,
-                    original=' '.join(current_line)
-                ))
-                current_line = []
-                current_timestamp = None
-            
-        return lyrics
+        parsed = (_parse_enhanced_line(line) for line in lrc.splitlines())
+        return [_make_line(timestamp, text) for timestamp, text in parsed if timestamp and text]
 
     def parse_regular_lrc(self, lrc: str) -> List[LyricLine]:
-        lyrics = []
-        for line in lrc.split('\n'):
-            if line.strip():
-                timestamp = re.search(r'\[([^\]]+)\]', line)
-                text = re.sub(r'\[[^\]]+\]', '', line).strip()
-                if timestamp and text:
-                    time_str = timestamp.group(1)
-                    minutes, seconds = map(float, time_str.split(':'))
-                    total_seconds = minutes * 60 + seconds
-                    
-                    lyrics.append(LyricLine(
-                        timestamp=timestamp.group(0),
-                        time_seconds=total_seconds,
-                        original=text
-                    ))
-        return lyrics
-
-    def fetch_lyrics_with_timeout(self, song_title: str, song_artist: str) -> Optional[str]:
+        parsed = (_parse_regular_line(line) for line in lrc.splitlines())
+        return [_make_line(timestamp, text) for timestamp, text in parsed if timestamp and text]
+
+    def parse_lrc(self, lrc: str) -> List[LyricLine]:
+        """Parses enhanced or regular LRC, depending on whether it has word timestamps."""
+        if '<' in lrc:
+            return self.parse_enhanced_lrc(lrc)
+        return self.parse_regular_lrc(lrc)
+
+    async def fetch_lyrics_with_timeout(self, song_title: str, song_artist: str) -> Optional[str]:
         current_time = time.time()
         
         # If we've recently tried and failed to fetch lyrics, don't try again yet
@@ -81,18 +99,27 @@ class SpotifyService:
             
         self.lyrics_fetch_time = current_time
         
+        # Search for enhanced and plain lyrics at the same time, preferring enhanced.
+        # This trades provider traffic for latency: a worker thread can't be
+        # interrupted, so the plain search always runs to completion, even when
+        # enhanced lyrics are found and its result is thrown away.
+        query = f"{song_title} {song_artist}"
+        enhanced_task = asyncio.create_task(asyncio.to_thread(syncedlyrics.search, query, enhanced=True))
+        plain_task = asyncio.create_task(asyncio.to_thread(syncedlyrics.search, query, plain_only=True))
+        
         try:
-            # Try enhanced lyrics first
-            enhanced_lrc = syncedlyrics.search(f"{song_title} {song_artist}", enhanced=True)
+            enhanced_lrc = await enhanced_task
             if enhanced_lrc:
+                # Only stops waiting for the plain search, its thread keeps running
+                plain_task.cancel()
                 return enhanced_lrc
                 
             # Fall back to plain lyrics
-            plain_lrc = syncedlyrics.search(f"{song_title} {song_artist}", plain_only=True)
-            return plain_lrc
+            return await plain_task
             
         except Exception as e:
             print(f"Error fetching lyrics: {e}")
+            plain_task.cancel()
             raise e
 
     def get_current_song_info(self) -> Optional[Song]:
@@ -122,87 +149,83 @@ class SpotifyService:
             print(f"Error getting current song: {e}")
             return None
 
-    def get_lyrics_for_song(self, song: Song) -> Optional[Song]:
+    async def get_lyrics_for_song(self, song: Song) -> Optional[Song]:
+        """Fetch lyrics for a given song; concurrent calls for the same track share one fetch."""
+        task = self._inflight.get(song.spotify_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_lyrics_for_song(song))
+            self._inflight[song.spotify_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(song.spotify_id, None))
+        # Shield so one caller going away doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def _fetch_lyrics_for_song(self, song: Song) -> Optional[Song]:
         """Fetch lyrics for a given song, using cache if available."""
-        cache_key = f"{song.title}-{song.artist}-lyrics"
-        cached_lyrics_data = cache_service.get_from_cache(cache_key)
+        cache_key = f"{song.spotify_id}-lyrics"
+        cached_lyrics_data = await cache_service.aget_from_cache(cache_key, max_age=cache_service.LYRICS_MAX_AGE)
 
-        if cached_lyrics_data:
+        if cached_lyrics_data and isinstance(cached_lyrics_data, dict) and 'version' in cached_lyrics_data and 'lyrics' in cached_lyrics_data:
             print(f"Found cached lyrics for '{song.title}'")
             try:
-                song.lyrics = [LyricLine.model_validate(line_data) for line_data in cached_lyrics_data]
+                song.lyrics = _LYRIC_LINES.validate_python(cached_lyrics_data['lyrics'])
+                song.lyrics_version = cached_lyrics_data['version']
                 self.current_song_cache = song
                 return song
             except Exception as e:
                 print(f"Error loading lyrics from cache, refetching. Error: {e}")
 
-        lrc = self.fetch_lyrics_with_timeout(song.title, song.artist)
+        lrc = await self.fetch_lyrics_with_timeout(song.title, song.artist)
         if lrc:
-            if '<' in lrc:
-                song.lyrics = self.parse_enhanced_lrc(lrc)
-            else:
-                song.lyrics = self.parse_regular_lrc(lrc)
+            song.lyrics = self.parse_lrc(lrc)
             
             if song.lyrics:
-                lyrics_to_cache = [line.model_dump() for line in song.lyrics]
-                cache_service.save_to_cache(cache_key, lyrics_to_cache)
+                song.lyrics_version = _lyrics_version(song.lyrics)
+                lyrics_to_cache = {
+                    "version": song.lyrics_version,
+                    "lyrics": [line.model_dump() for line in song.lyrics]
+                }
+                cache_service.save_to_cache_async(cache_key, lyrics_to_cache)
             
             self.current_song_cache = song
             return song
         return None
 
+    async def aget_current_song_info(self) -> Optional[Song]:
+        """Async variant of get_current_song_info that runs the Spotify call in a worker thread."""
+        return await asyncio.to_thread(self.get_current_song_info)
+
+    async def aget_current_playback_state(self) -> Optional[dict]:
+        """Async variant of get_current_playback_state that runs the Spotify call in a worker thread."""
+        return await asyncio.to_thread(self.get_current_playback_state)
+
     def get_current_playback_state(self) -> Optional[dict]:
+        now = time.time()
+        if self._playback_cache:
+            fetched_at, ttl, state = self._playback_cache
+            age = now - fetched_at
+            if age < ttl:
+                # Extrapolate the position instead of asking Spotify again
+                position = state["position"] + age if state["is_playing"] else state["position"]
+                return {**state, "position": position, "timestamp": now, "next_poll_in": ttl - age}
+
         try:
             playback = self.sp.current_playback()
             if not playback or not playback.get('item'):
-                return {"is_playing": False, "position": 0, "timestamp": time.time()}
-
-            return {
-                "is_playing": playback['is_playing'],
-                "position": playback['progress_ms'] / 1000,
-                "timestamp": time.time()
-            }
+                state = {"is_playing": False, "position": 0, "timestamp": now}
+                ttl = PLAYBACK_CACHE_MAX_TTL
+            else:
+                state = {
+                    "is_playing": playback['is_playing'],
+                    "position": playback['progress_ms'] / 1000,
+                    "timestamp": now
+                }
+                # Re-poll around the end of the track, but at least every PLAYBACK_CACHE_MAX_TTL
+                remaining = (playback['item'].get('duration_ms', 0) - playback['progress_ms']) / 1000
+                ttl = max(min(remaining - 0.5, PLAYBACK_CACHE_MAX_TTL), PLAYBACK_CACHE_MIN_TTL)
+
+            state["next_poll_in"] = ttl
+            self._playback_cache = (now, ttl, state)
+            return state
         except Exception as e:
             print(f"Error getting playback state: {e}")
             return None
-
-    def get_current_song(self) -> Optional[Song]:
-        try:
-            current_track = self.sp.current_user_playing_track()
-            if not current_track:
-                return None
-
-            track = current_track['item']
-            track_id = track['id']
-            
-            # If we have the same song cached, just update the position
-            if (self.current_song_cache and 
-                self.current_song_cache.spotify_id == track_id):
-                self.current_song_cache.current_position = current_track['progress_ms'] / 1000
-                self.current_song_cache.is_playing = current_track['is_playing']
-                return self.current_song_cache
-
-            # Create new song object
-            song = Song(
-                title=track['name'],
-                artist=track['artists'][0]['name'],
-                spotify_id=track_id,
-                current_position=current_track['progress_ms'] / 1000,
-                is_playing=current_track['is_playing']
-            )
-
-            # Fetch lyrics
-            lrc = self.fetch_lyrics_with_timeout(song.title, song.artist)
-            if lrc:
-                if '<' in lrc:  # Check if it's enhanced format
-                    song.lyrics = self.parse_enhanced_lrc(lrc)
-                else:
-                    song.lyrics = self.parse_regular_lrc(lrc)
-
-            # Cache the new song
-            self.current_song_cache = song
-            return song
-
-        except Exception as e:
-            print(f"Error getting current song: {e}")
-            return None 
\ No newline at end of file
@@ -1,10 +1,11 @@
 import asyncio
-from typing import List, Optional, Tuple
-from pydantic import BaseModel
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
 from google import genai
 from google.genai import types
 from models import LyricLine, TranslationStats
 import os
+import sys
 import json
 import cache_service
 import time
@@ -12,6 +13,15 @@ import time
 class TranslationResponse(BaseModel):
     translations: List[str]
 
+class LanguageTranslations(BaseModel):
+    language: str
+    translations: List[str]
+
+class MultiTranslationResponse(BaseModel):
+    # A list of entries rather than a dict keyed by language, since Gemini's
+    # response schemas don't support free-form object keys.
+    translations: List[LanguageTranslations]
+
 class SimpleTranslationResponse(BaseModel):
     translation: str
 
@@ -21,6 +31,35 @@ class LanguageDetectionResponse(BaseModel):
 class PhoneticsResponse(BaseModel):
     phonetics: List[str]
 
+def _song_key(title: str, artist: str, spotify_id: Optional[str], lyrics_version: Optional[str]) -> str:
+    """Identifies a song's lyrics in cache keys by Spotify id and lyrics fingerprint, falling back to title and artist."""
+    if spotify_id and lyrics_version:
+        return f"{spotify_id}-{lyrics_version}"
+    return f"{title}-{artist}"
+
+def _word_count(translations: List[str]) -> int:
+    """Counts whitespace-separated words across translated lines without joining them."""
+    return sum(len(text.split()) for text in translations)
+
+def _is_translatable(text: str) -> bool:
+    """Whether a lyric line has anything to translate beyond whitespace and punctuation."""
+    return any(ch.isalnum() for ch in text)
+
+class _RateLimiter:
+    """Leaky bucket that spaces out calls so at most `rate` start per second."""
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def acquire(self):
+        if not self._interval:
+            return
+        now = time.monotonic()
+        wait = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
 class TranslationService:
     def __init__(self):
         # The google-genai SDK uses the GOOGLE_API_KEY environment variable by default.
@@ -35,6 +74,16 @@ class TranslationService:
                 f"Original error: {e}"
             )
 
+        # Cap in-flight and per-second Gemini requests so wide fan-outs don't trip the quota
+        self._sem = asyncio.Semaphore(max(1, int(os.getenv("GEMINI_CONCURRENCY", "8"))))
+        self._rate_limiter = _RateLimiter(float(os.getenv("GEMINI_RATE_LIMIT", "5")))
+
+    async def _call_model(self, **kwargs):
+        """Calls generate_content within the concurrency and rate limits."""
+        async with self._sem:
+            await self._rate_limiter.acquire()
+            return await self.client.aio.models.generate_content(**kwargs)
+
     def _build_thinking_config(self, model_name: Optional[str], thinking_mode: Optional[str]) -> Optional[types.ThinkingConfig]:
         """Builds the thinking configuration based on the selected mode and model."""
         if not model_name or not thinking_mode or thinking_mode == "default":
@@ -51,19 +100,41 @@ class TranslationService:
         
         return None
 
-    async def translate_lyrics(self, song_title: str, song_artist: str, lyrics: List[LyricLine], languages_to_translate: dict[str, str], original_languages: Optional[List[str]] = None, model_name: Optional[str] = None, thinking_mode: Optional[str] = None) -> Tuple[List[LyricLine], List[TranslationStats]]:
+    async def translate_lyrics(self, song_title: str, song_artist: str, lyrics: List[LyricLine], languages_to_translate: dict[str, str], original_languages: Optional[List[str]] = None, model_name: Optional[str] = None, thinking_mode: Optional[str] = None, lyrics_version: Optional[str] = None, spotify_id: Optional[str] = None) -> Tuple[List[LyricLine], List[TranslationStats]]:
         if not lyrics or not languages_to_translate:
             return lyrics, []
 
-        tasks = []
-        lang_order_for_api = []
-        stats_list = []
+        stats_list = [
+            stats
+            async for _, stats in self.translate_lyrics_stream(
+                song_title, song_artist, lyrics, languages_to_translate, original_languages,
+                model_name=model_name, thinking_mode=thinking_mode, lyrics_version=lyrics_version, spotify_id=spotify_id
+            )
+            if stats
+        ]
+        return lyrics, stats_list
+
+    async def translate_lyrics_stream(self, song_title: str, song_artist: str, lyrics: List[LyricLine], languages_to_translate: dict[str, str], original_languages: Optional[List[str]] = None, model_name: Optional[str] = None, thinking_mode: Optional[str] = None, lyrics_version: Optional[str] = None, spotify_id: Optional[str] = None) -> AsyncIterator[Tuple[str, Optional[TranslationStats]]]:
+        """Applies each language's translation to the lyrics as soon as it is ready and yields (lang_code, stats); stats is None if that language failed."""
+        if not lyrics or not languages_to_translate:
+            return
+
+        # Interned codes make the per-line translations[lang_code] stores hash once and compare by identity
+        languages_to_translate = {sys.intern(code): name for code, name in languages_to_translate.items()}
+
+        task_to_lang = {}
+        misses = {}
         
+        song_key = _song_key(song_title, song_artist, spotify_id, lyrics_version)
+        cache_keys = {lang_code: f"{song_key}-{lang_code}-translation" for lang_code in languages_to_translate}
+        cached = await cache_service.amget_from_cache(list(cache_keys.values()), max_age=cache_service.TRANSLATION_MAX_AGE)
+
         for lang_code, lang_name in languages_to_translate.items():
-            cache_key = f"{song_title}-{song_artist}-{lang_code}-translation"
-            cached_data = cache_service.get_from_cache(cache_key)
+            cached_data = cached[cache_keys[lang_code]]
 
-            if cached_data and isinstance(cached_data, dict) and 'translations' in cached_data and 'stats' in cached_data:
+            # Translations made from a different version of the lyrics are stale
+            if (cached_data and isinstance(cached_data, dict) and 'translations' in cached_data and 'stats' in cached_data
+                    and cached_data.get('lyrics_version') == lyrics_version):
                 print(f"Found cached translation for '{song_title}' to {lang_name}")
                 cached_translations = cached_data['translations']
                 cached_stats = cached_data['stats']
@@ -73,50 +144,106 @@ class TranslationService:
 
                 stats = TranslationStats.model_validate(cached_stats)
                 stats.from_cache = True
-                stats_list.append(stats)
+                yield lang_code, stats
             else:
                 print(f"No cache for '{song_title}' to {lang_name}. Will call API.")
-                tasks.append(self.translate_to_language(lyrics, lang_name, original_languages, model_name=model_name, thinking_mode=thinking_mode))
-                lang_order_for_api.append((lang_code, lang_name))
-
-        if not tasks:
-            return lyrics, stats_list
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+                misses[lang_code] = lang_name
+
+        # Every request sends the same text, so build it once per song. Blank and
+        # punctuation-only lines aren't sent; they get an empty translation.
+        keep_idx = [i for i, line in enumerate(lyrics) if _is_translatable(line.original)]
+        content_to_translate = "\n".join(lyrics[i].original for i in keep_idx)
+        num_lines = len(keep_idx)
+
+        def translate_one(lang_code: str, lang_name: str):
+            task = asyncio.ensure_future(self.translate_to_language(content_to_translate, num_lines, lang_name, original_languages, model_name=model_name, thinking_mode=thinking_mode))
+            task_to_lang[task] = (lang_code, lang_name)
+            return task
+
+        def apply(lang_code: str, kept_translations: List[str], stats: TranslationStats):
+            translations = [""] * len(lyrics)
+            for kept_idx, translation in zip(keep_idx, kept_translations):
+                translations[kept_idx] = translation
+
+            data_to_cache = {
+                "translations": translations,
+                "stats": stats.model_dump(),
+                "lyrics_version": lyrics_version
+            }
+            cache_service.save_to_cache_async(cache_keys[lang_code], data_to_cache)
+            
+            for line_idx, translation in enumerate(translations):
+                lyrics[line_idx].translations[lang_code] = translation
 
-        for i, (lang_code, lang_name) in enumerate(lang_order_for_api):
-            result = results[i]
-            if isinstance(result, Exception):
-                print(f"Translation error for {lang_name}: {str(result)}")
-                error_msg = f"Translation error: {str(result)}"
-                for line in lyrics:
-                    line.translations[lang_code] = error_msg
-            else:
-                translations, stats = result
-                stats_list.append(stats)
-                
-                cache_key = f"{song_title}-{song_artist}-{lang_code}-translation"
-                data_to_cache = {
-                    "translations": translations,
-                    "stats": stats.model_dump()
-                }
-                cache_service.save_to_cache(cache_key, data_to_cache)
-                
-                for line_idx, translation in enumerate(translations):
-                    lyrics[line_idx].translations[lang_code] = translation
-        
-        return lyrics, stats_list
+        def fail(lang_code: str, lang_name: str, error: BaseException):
+            print(f"Translation error for {lang_name}: {str(error)}")
+            error_msg = f"Translation error: {str(error)}"
+            for line in lyrics:
+                line.translations[lang_code] = error_msg
+
+        if misses and not keep_idx:
+            for lang_code, lang_name in misses.items():
+                stats = TranslationStats(language_name=lang_name, duration_seconds=0, translated_word_count=0, translated_token_count=0)
+                apply(lang_code, [], stats)
+                yield lang_code, stats
+            return
+
+        if len(misses) > 1:
+            # One request for every missing language; the batch task maps to None
+            batch_task = asyncio.ensure_future(self.translate_all_languages(content_to_translate, num_lines, misses, original_languages, model_name=model_name, thinking_mode=thinking_mode))
+            task_to_lang[batch_task] = None
+        else:
+            for lang_code, lang_name in misses.items():
+                translate_one(lang_code, lang_name)
+
+        pending = set(task_to_lang)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task_to_lang[task] is None:
+                        error = task.exception()
+                        if error is not None and not isinstance(error, ValidationError):
+                            for lang_code, lang_name in misses.items():
+                                fail(lang_code, lang_name, error)
+                                yield lang_code, None
+                            continue
+
+                        results = task.result() if error is None else {}
+                        for lang_code, lang_name in misses.items():
+                            if lang_code in results:
+                                apply(lang_code, *results[lang_code])
+                                yield lang_code, results[lang_code][1]
+                            else:
+                                # The response didn't match the schema for this language, ask for it on its own
+                                pending.add(translate_one(lang_code, lang_name))
+                        continue
+
+                    lang_code, lang_name = task_to_lang[task]
+                    if task.exception() is not None:
+                        fail(lang_code, lang_name, task.exception())
+                        yield lang_code, None
+                        continue
+
+                    translations, stats = task.result()
+                    apply(lang_code, translations, stats)
+                    yield lang_code, stats
+        finally:
+            # Don't leave API calls running if the consumer stops early
+            for task in pending:
+                task.cancel()
         
-    async def get_phonetics(self, song_title: str, song_artist: str, lyrics: List[LyricLine], original_languages: List[str], model_name: Optional[str] = None, thinking_mode: Optional[str] = None) -> List[LyricLine]:
+    async def get_phonetics(self, song_title: str, song_artist: str, lyrics: List[LyricLine], original_languages: List[str], model_name: Optional[str] = None, thinking_mode: Optional[str] = None, lyrics_version: Optional[str] = None, spotify_id: Optional[str] = None) -> List[LyricLine]:
         if not lyrics:
             return lyrics
         
-        cache_key = f"{song_title}-{song_artist}-phonetics"
-        cached_phonetics = cache_service.get_from_cache(cache_key)
+        cache_key = f"{_song_key(song_title, song_artist, spotify_id, lyrics_version)}-phonetics"
+        cached_data = await cache_service.aget_from_cache(cache_key, max_age=cache_service.PHONETICS_MAX_AGE)
 
-        if cached_phonetics and isinstance(cached_phonetics, list) and len(cached_phonetics) == len(lyrics):
+        if (cached_data and isinstance(cached_data, dict) and cached_data.get('lyrics_version') == lyrics_version
+                and isinstance(cached_data.get('phonetics'), list) and len(cached_data['phonetics']) == len(lyrics)):
             print(f"Found cached phonetics for '{song_title}'")
-            for i, phonetic_text in enumerate(cached_phonetics):
+            for i, phonetic_text in enumerate(cached_data['phonetics']):
                 lyrics[i].phonetics = phonetic_text
             return lyrics
         
@@ -149,7 +276,7 @@ class TranslationService:
                     thinking_config=thinking_config,
                 )
 
-            response = await self.client.aio.models.generate_content(
+            response = await self._call_model(
                 model=model_to_use,
                 contents=content_to_process,
                 config=generate_config,
@@ -166,7 +293,7 @@ class TranslationService:
                 lyrics[i].phonetics = phonetic_text
                 phonetics_to_cache.append(phonetic_text)
             
-            cache_service.save_to_cache(cache_key, phonetics_to_cache)
+            cache_service.save_to_cache_async(cache_key, {"phonetics": phonetics_to_cache, "lyrics_version": lyrics_version})
 
             return lyrics
 
@@ -176,12 +303,12 @@ class TranslationService:
                 line.phonetics = "Phonetics generation failed."
             return lyrics
             
-    async def detect_language(self, lyrics: List[LyricLine], title: str, artist: str, model_name: Optional[str] = None, thinking_mode: Optional[str] = None) -> List[str]:
+    async def detect_language(self, lyrics: List[LyricLine], title: str, artist: str, model_name: Optional[str] = None, thinking_mode: Optional[str] = None, lyrics_version: Optional[str] = None, spotify_id: Optional[str] = None) -> List[str]:
         if not lyrics:
             return []
 
-        cache_key = f"{title}-{artist}-language"
-        cached_languages = cache_service.get_from_cache(cache_key)
+        cache_key = f"{_song_key(title, artist, spotify_id, lyrics_version)}-language"
+        cached_languages = await cache_service.aget_from_cache(cache_key, max_age=cache_service.LANGUAGE_MAX_AGE)
         if cached_languages and isinstance(cached_languages, list):
             print(f"Found cached language detection for '{title}'")
             return cached_languages
@@ -205,7 +332,7 @@ class TranslationService:
                     thinking_config=thinking_config,
                 )
 
-            response = await self.client.aio.models.generate_content(
+            response = await self._call_model(
                 model=model_to_use,
                 contents=sample_lyrics,
                 config=generate_config,
@@ -214,7 +341,7 @@ class TranslationService:
             parsed_response = LanguageDetectionResponse.model_validate_json(response.text)
             
             # Cache the result
-            cache_service.save_to_cache(cache_key, parsed_response.languages)
+            cache_service.save_to_cache_async(cache_key, parsed_response.languages)
             
             return parsed_response.languages
             
@@ -222,54 +349,57 @@ class TranslationService:
             print(f"Language detection error: {str(e)}")
             return ["Detection Failed"]
         
-    async def translate_to_language(self, lyrics: List[LyricLine], target_lang_name: str, original_languages: Optional[List[str]] = None, model_name: Optional[str] = None, thinking_mode: Optional[str] = None) -> Tuple[List[str], TranslationStats]:
-        try:
-            lines_to_translate = [line.original for line in lyrics]
-            num_lines = len(lines_to_translate)
-            content_to_translate = "\n".join(lines_to_translate)
-            
-            source_lang_info = ""
-            if original_languages and "Detection Failed" not in original_languages:
-                source_lang_info = f" from {', '.join(original_languages)}"
-
-            system_instruction = (
-                f"You are a translation expert. Translate the user's text{source_lang_info} to {target_lang_name}. "
-                "The user's text consists of song lyrics separated by newlines. "
-                f"There are exactly {num_lines} lines of input. "
-                "Your response must be a JSON object that adheres to the provided schema. "
-                f"The 'translations' list must contain exactly {num_lines} translated strings, "
-                "one for each line of input text, in the same order. "
-                "Do not merge, split, or omit any lines. Maintain a one-to-one correspondence between input lines and translated lines."
+    async def _request_line_translations(self, content_to_translate: str, num_lines: int, target_description: str, list_instruction: str, response_schema: type, original_languages: Optional[List[str]] = None, model_name: Optional[str] = None, thinking_mode: Optional[str] = None) -> Tuple[types.GenerateContentResponse, float]:
+        """Sends the lyric lines with the shared line-by-line translation prompt, returning the response and its duration."""
+        source_lang_info = ""
+        if original_languages and "Detection Failed" not in original_languages:
+            source_lang_info = f" from {', '.join(original_languages)}"
+
+        system_instruction = (
+            f"You are a translation expert. Translate the user's text{source_lang_info} to {target_description}. "
+            "The user's text consists of song lyrics separated by newlines. "
+            f"There are exactly {num_lines} lines of input. "
+            "Your response must be a JSON object that adheres to the provided schema. "
+            f"{list_instruction} must contain exactly {num_lines} translated strings, "
+            "one for each line of input text, in the same order. "
+            "Do not merge, split, or omit any lines. Maintain a one-to-one correspondence between input lines and translated lines."
+        )
+
+        model_to_use = model_name or 'models/gemini-1.5-flash-latest'
+        
+        thinking_config = self._build_thinking_config(model_to_use, thinking_mode)
+        generate_config = types.GenerateContentConfig(
+                response_mime_type='application/json',
+                response_schema=response_schema,
+                system_instruction=system_instruction,
+                thinking_config=thinking_config,
             )
 
-            model_to_use = model_name or 'models/gemini-1.5-flash-latest'
-            
-            thinking_config = self._build_thinking_config(model_to_use, thinking_mode)
-            generate_config = types.GenerateContentConfig(
-                    response_mime_type='application/json',
-                    response_schema=TranslationResponse,
-                    system_instruction=system_instruction,
-                    thinking_config=thinking_config,
-                )
+        start_time = time.time()
+        response = await self._call_model(
+            model=model_to_use,
+            contents=content_to_translate,
+            config=generate_config
+        )
+        return response, time.time() - start_time
 
-            start_time = time.time()
-            response = await self.client.aio.models.generate_content(
-                model=model_to_use,
-                contents=content_to_translate,
-                config=generate_config
+    async def translate_to_language(self, content_to_translate: str, num_lines: int, target_lang_name: str, original_languages: Optional[List[str]] = None, model_name: Optional[str] = None, thinking_mode: Optional[str] = None) -> Tuple[List[str], TranslationStats]:
+        try:
+            response, duration = await self._request_line_translations(
+                content_to_translate, num_lines, target_lang_name,
+                "The 'translations' list", TranslationResponse,
+                original_languages, model_name, thinking_mode
             )
-            duration = time.time() - start_time
 
             # The response.text will be a JSON string matching the schema.
             parsed_response = TranslationResponse.model_validate_json(response.text)
             
             translations = parsed_response.translations
-            if len(translations) != len(lyrics):
+            if len(translations) != num_lines:
                 # This indicates the model didn't follow instructions.
-                raise Exception(f"Model returned {len(translations)} translations, but {len(lyrics)} were expected.")
+                raise Exception(f"Model returned {len(translations)} translations, but {num_lines} were expected.")
             
-            translated_text = " ".join(translations)
-            translated_word_count = len(translated_text.split())
+            translated_word_count = _word_count(translations)
 
             stats = TranslationStats(
                 language_name=target_lang_name,
@@ -284,6 +414,45 @@ class TranslationService:
             print(f"Translation error for {target_lang_name}: {str(e)}")
             raise e
 
+    async def translate_all_languages(self, content_to_translate: str, num_lines: int, languages_to_translate: dict[str, str], original_languages: Optional[List[str]] = None, model_name: Optional[str] = None, thinking_mode: Optional[str] = None) -> Dict[str, Tuple[List[str], TranslationStats]]:
+        """Translates the lyrics into several languages with one request, keyed by language code; languages missing or malformed in the response are left out."""
+        try:
+            response, duration = await self._request_line_translations(
+                content_to_translate, num_lines,
+                f"each of these languages: {', '.join(languages_to_translate.values())}",
+                "The 'translations' list must contain one entry per target language, with 'language' set to the language name exactly as given above. "
+                "Each entry's 'translations' list",
+                MultiTranslationResponse, original_languages, model_name, thinking_mode
+            )
+
+            parsed_response = MultiTranslationResponse.model_validate_json(response.text)
+            by_name = {entry.language.strip().lower(): entry.translations for entry in parsed_response.translations}
+
+            results = {}
+            for lang_code, lang_name in languages_to_translate.items():
+                translations = by_name.get(lang_name.strip().lower())
+                if translations is None or len(translations) != num_lines:
+                    print(f"Batch translation response has no usable {lang_name} translation.")
+                    continue
+                results[lang_code] = (translations, _word_count(translations))
+
+            # Token usage is only reported for the whole response, so split it by word count
+            total_words = sum(word_count for _, word_count in results.values()) or 1
+            total_tokens = response.usage_metadata.candidates_token_count or 0
+            return {
+                lang_code: (translations, TranslationStats(
+                    language_name=languages_to_translate[lang_code],
+                    duration_seconds=duration,
+                    translated_word_count=word_count,
+                    translated_token_count=round(total_tokens * word_count / total_words)
+                ))
+                for lang_code, (translations, word_count) in results.items()
+            }
+
+        except Exception as e:
+            print(f"Batch translation error for {', '.join(languages_to_translate.values())}: {str(e)}")
+            raise e
+
     async def _translate_single_text(self, text: str, target_lang_name: str, model_name: Optional[str] = None, thinking_mode: Optional[str] = None) -> str:
         try:
             system_instruction = (
@@ -303,7 +472,7 @@ class TranslationService:
                     thinking_config=thinking_config,
                 )
 
-            response = await self.client.aio.models.generate_content(
+            response = await self._call_model(
                 model=model_to_use,
                 contents=text,
                 config=generate_config,
@@ -324,9 +493,11 @@ class TranslationService:
         lang_order_for_api = []
         translated_titles = {}
 
+        cache_keys = {lang_code: f"{text_to_translate}-{lang_code}-title-translation" for lang_code in languages_to_translate}
+        cached = await cache_service.amget_from_cache(list(cache_keys.values()), max_age=cache_service.TRANSLATION_MAX_AGE)
+
         for lang_code, lang_name in languages_to_translate.items():
-            cache_key = f"{text_to_translate}-{lang_code}-title-translation"
-            cached_translation = cache_service.get_from_cache(cache_key)
+            cached_translation = cached[cache_keys[lang_code]]
 
             if cached_translation and isinstance(cached_translation, str):
                 print(f"Found cached title translation for '{text_to_translate}' to {lang_name}")
@@ -348,7 +519,6 @@ class TranslationService:
                 translated_titles[lang_code] = "Translation Error"
             else:
                 translated_titles[lang_code] = result
-                cache_key = f"{text_to_translate}-{lang_code}-title-translation"
-                cache_service.save_to_cache(cache_key, result)
+                cache_service.save_to_cache_async(cache_keys[lang_code], result)
 
         return translated_titles 
\ No newline at end of file